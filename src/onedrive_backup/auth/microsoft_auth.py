@@ -76,11 +76,14 @@ class MicrosoftGraphAuth:
         return self._app
     
     def _save_token_cache(self):
-        """Save token cache to disk."""
+        """Save token cache to disk, readable by the current user only."""
         app = self._get_msal_app()
         if app.token_cache.has_state_changed:
-            with open(self.token_cache_path, 'w') as f:
+            fd = os.open(self.token_cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
                 f.write(app.token_cache.serialize())
+            # Tighten caches written by older versions with default permissions
+            os.chmod(self.token_cache_path, 0o600)
     
     def authenticate(self, use_interactive: bool = True) -> str:
         """Authenticate and get access token.
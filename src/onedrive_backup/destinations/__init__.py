@@ -1,5 +1,6 @@
 """Destination handlers for backup uploads."""
 
+from .aws_s3 import S3BatchDeleter
 from .azure_blob import AzureBlobDestination
 
-__all__ = ['AzureBlobDestination']
+__all__ = ['AzureBlobDestination', 'S3BatchDeleter']
@@ -0,0 +1,75 @@
+"""AWS S3 destination helpers."""
+
+import logging
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# S3 DeleteObjects accepts at most 1000 keys per request
+MAX_DELETE_BATCH = 1000
+
+
+class S3BatchDeleter:
+    """Queue S3 object deletions and send them as DeleteObjects batches.
+    
+    Keys are flushed every MAX_DELETE_BATCH deletions and when the context
+    manager exits, so cleanup costs one request per 1000 keys instead of one
+    per key.
+    """
+    
+    def __init__(self, s3_client, bucket: str, batch_size: int = MAX_DELETE_BATCH):
+        """Initialize batch deleter.
+        
+        Args:
+            s3_client: boto3 S3 client
+            bucket: Bucket to delete from
+            batch_size: Keys per DeleteObjects request (max 1000)
+        """
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.batch_size = min(batch_size, MAX_DELETE_BATCH)
+        self.deleted_count = 0
+        self.errors: List[Dict[str, Any]] = []
+        self._pending: List[Dict[str, str]] = []
+    
+    def delete(self, key: str):
+        """Queue a key for deletion, flushing if the batch is full.
+        
+        Args:
+            key: Object key to delete
+        """
+        self._pending.append({'Key': key})
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+    
+    def flush(self) -> int:
+        """Delete all queued keys.
+        
+        Returns:
+            Number of keys deleted successfully
+        """
+        if not self._pending:
+            return 0
+        
+        objects, self._pending = self._pending, []
+        response = self.s3_client.delete_objects(
+            Bucket=self.bucket,
+            Delete={'Objects': objects, 'Quiet': True}
+        )
+        
+        # Quiet mode only reports keys that failed
+        errors = response.get('Errors', [])
+        for error in errors:
+            logger.warning(f"Failed to delete s3://{self.bucket}/{error.get('Key')}: {error.get('Message')}")
+        self.errors.extend(errors)
+        
+        deleted = len(objects) - len(errors)
+        self.deleted_count += deleted
+        return deleted
+    
+    def __enter__(self) -> "S3BatchDeleter":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+        return False
@@ -1,6 +1,7 @@
 """Main backup manager orchestrating the backup process."""
 
 import asyncio
+import gzip
 import json
 import logging
 import os
@@ -328,7 +329,10 @@ class BackupManager:
                 Key=metadata_key
             )
             
-            metadata = json.loads(response['Body'].read().decode('utf-8'))
+            body = response['Body'].read()
+            if response.get('ContentEncoding') == 'gzip':
+                body = gzip.decompress(body)
+            metadata = json.loads(body.decode('utf-8'))
             last_backup_time = metadata.get('last_backup_time')
             
             if last_backup_time:
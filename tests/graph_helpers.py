@@ -0,0 +1,522 @@
+"""Shared Microsoft Graph request helpers for the test scripts."""
+
+import asyncio
+import base64
+import functools
+import itertools
+import json
+import logging
+import os
+import queue
+import sqlite3
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# loads/dumps convert between JSON bytes and Python objects for the scripts
+try:
+    import orjson
+    loads = orjson.loads
+    dumps = orjson.dumps
+except ImportError:  # orjson is optional; stdlib json also accepts bytes
+    loads = json.loads
+    
+    def dumps(obj):
+        """Serialize to compact JSON bytes, like orjson.dumps."""
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+try:
+    import ijson
+except ImportError:  # ijson is optional; pages are then parsed whole
+    ijson = None
+
+# Base URL of every Graph call
+GRAPH = 'https://graph.microsoft.com/v1.0'
+GRAPH_BATCH_URL = f'{GRAPH}/$batch'
+GRAPH_BATCH_LIMIT = 20  # Max sub-requests per $batch call
+
+# Upper bound on Graph requests in flight at once
+GRAPH_MAX_CONCURRENCY = 64
+
+# Graph throttles at roughly 10,000 requests per 10 minutes per app and tenant
+GRAPH_RATE_LIMIT = 10000 / 600
+GRAPH_BURST = 200
+
+# Query options projecting Graph listings down to the fields the tests read
+CHILDREN_QUERY = '$select=id,name,size,lastModifiedDateTime,folder&$top=999'
+USERS_QUERY = '$select=id,displayName,mail,userPrincipalName'
+SITES_QUERY = '$select=id,displayName'
+DRIVES_QUERY = '$select=id,name,driveType,owner'
+
+# Local copies of Graph responses, revalidated with If-None-Match on re-runs
+GRAPH_CACHE_PATH = Path.home() / ".onedrive_backup" / "graph_cache.sqlite3"
+DISCOVERY_MAX_AGE = 60  # Seconds a cached discovery listing is served without asking Graph
+STREAM_BATCH_SIZE = 100  # Items parsed per thread-pool call when streaming a page
+
+_executor = ThreadPoolExecutor(max_workers=GRAPH_MAX_CONCURRENCY)
+
+# Shared keep-alive connection pool for all Graph calls. Connection errors and
+# transient 5xx responses are retried by urllib3; 429s are left to fetch() so
+# the rate limiter can back off as a whole. Responses are compressed without
+# extra setup: requests already sends Accept-Encoding gzip/deflate, plus br
+# when the brotli package is installed, and urllib3 decodes the body.
+session = requests.Session()
+session.mount('https://', HTTPAdapter(
+    pool_connections=GRAPH_MAX_CONCURRENCY,
+    pool_maxsize=GRAPH_MAX_CONCURRENCY,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=1,
+        status_forcelist=[500, 502, 503, 504],
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+))
+
+class TokenBucket:
+    """Token-bucket rate limiter for use from a single event loop."""
+    
+    def __init__(self, rate, capacity):
+        """Initialize the bucket.
+        
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum number of tokens (burst size)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+    
+    def defer(self, seconds):
+        """Withhold all tokens for the given number of seconds (e.g. after a 429).
+        
+        Deferrals overlap rather than add up, so a burst of 429s carrying the
+        same Retry-After pauses traffic once.
+        """
+        self._refill()
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+limiter = TokenBucket(GRAPH_RATE_LIMIT, GRAPH_BURST)
+
+async def fetch(url, headers, session=session, max_retries=5, stream=False):
+    """GET a Graph URL without blocking the event loop.
+    
+    Every attempt takes a token from the shared limiter. Throttled (429)
+    responses are retried, honoring the Retry-After header when present
+    and otherwise backing off exponentially (1s, 2s, 4s, ... capped at 60s).
+    With stream=True the body is left unread for the caller to consume.
+    """
+    loop = asyncio.get_running_loop()
+    retry_delay = 1
+    for attempt in range(max_retries):
+        await limiter.acquire()
+        response = await loop.run_in_executor(
+            _executor, functools.partial(session.get, url, headers=headers, stream=stream)
+        )
+        if response.status_code != 429 or attempt == max_retries - 1:
+            return response
+        response.close()
+        try:
+            wait_time = int(response.headers.get('Retry-After', retry_delay))
+        except ValueError:
+            wait_time = retry_delay
+        limiter.defer(wait_time)
+        await asyncio.sleep(wait_time)
+        retry_delay = min(retry_delay * 2, 60)
+    return response
+
+def is_app_only_token(token):
+    """Check whether an access token was issued to the app itself (client credentials).
+    
+    Reads the JWT payload without verifying it; Graph validates the token anyway.
+    App-only tokens carry idtyp=app when that optional claim is emitted, and never
+    carry delegated scopes (scp).
+    """
+    claims = _token_claims(token)
+    return claims.get('idtyp') == 'app' or 'scp' not in claims
+
+def _token_claims(token):
+    payload = token.split('.')[1]
+    return json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+
+def _cache_identity(headers):
+    """Identify who a cached response was fetched for, from the bearer token.
+    
+    Covers the tenant, app, principal and granted permissions, so switching
+    any of them never serves another identity's data. Returns None when the
+    token can't be read, in which case nothing is cached.
+    """
+    token = headers.get('Authorization', '').removeprefix('Bearer ')
+    try:
+        claims = _token_claims(token)
+    except (IndexError, ValueError):
+        return None
+    permissions = ' '.join(sorted(claims.get('roles') or claims.get('scp', '').split()))
+    app_id = claims.get('appid') or claims.get('azp', '')
+    return f"{claims.get('tid', '')}|{app_id}|{claims.get('oid', '')}|{permissions}"
+
+def error_message(response):
+    """Extract the Graph error message from a failed response.
+    
+    Falls back to the start of the body when it isn't a Graph error document.
+    """
+    try:
+        return loads(response.content)['error']['message']
+    except (ValueError, KeyError, TypeError):
+        return response.text[:200]
+
+def write_private_file(path, data):
+    """Write bytes to a file readable by the current user only.
+    
+    The data goes to a temporary file first and is swapped in, so an
+    interrupted run never leaves a truncated file behind.
+    """
+    tmp_path = f'{path}.tmp'
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _cached_response(url, body):
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response.encoding = 'utf-8'
+    response._content = body
+    return response
+
+# Pre-authenticated download links are never written to the on-disk cache
+_DOWNLOAD_URL = '@microsoft.graph.downloadUrl'
+
+def _without_download_urls(body):
+    if _DOWNLOAD_URL.encode() not in body:
+        return body
+    data = loads(body)
+    for item in data.get('value', [data]):
+        item.pop(_DOWNLOAD_URL, None)
+    return dumps(data)
+
+class GraphCache:
+    """On-disk SQLite cache of successful Graph GET responses.
+    
+    Entries are keyed by URL and by the identity of the token they were
+    fetched with (see _cache_identity). Bodies are stored zlib-compressed
+    along with their ETag, minus any @microsoft.graph.downloadUrl links, in
+    a database only the current user can read. The database is opened on
+    first use and must only be used from the event loop thread.
+    """
+    
+    def __init__(self, path=GRAPH_CACHE_PATH):
+        self.path = path
+        self._db = None
+    
+    def _connect(self):
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Bodies hold user details, so create the file readable by this user only
+            os.close(os.open(self.path, os.O_WRONLY | os.O_CREAT, 0o600))
+            self._db = sqlite3.connect(self.path)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS responses '
+                '(identity TEXT, url TEXT, fetched_at INTEGER, etag TEXT, body BLOB, '
+                'PRIMARY KEY (identity, url))'
+            )
+        return self._db
+    
+    def _lookup(self, identity, url):
+        return self._connect().execute(
+            'SELECT fetched_at, etag, body FROM responses WHERE identity = ? AND url = ?',
+            (identity, url)
+        ).fetchone()
+    
+    def _touch(self, identity, url, now):
+        with self._db:
+            self._db.execute(
+                'UPDATE responses SET fetched_at = ? WHERE identity = ? AND url = ?',
+                (now, identity, url)
+            )
+    
+    def _store(self, identity, url, now, etag, body):
+        with self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses (identity, url, fetched_at, etag, body) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (identity, url, now, etag, zlib.compress(_without_download_urls(body)))
+            )
+    
+    async def get_or_fetch(self, url, headers, ttl, session=session):
+        """GET a Graph URL, reusing the cached copy when it is still current.
+        
+        Copies younger than ttl seconds are served without a request. Older
+        ones are revalidated with If-None-Match, and a 304 serves the stored
+        body instead of downloading it again.
+        """
+        identity = _cache_identity(headers)
+        if identity is None:
+            return await fetch(url, headers, session)
+        now = int(time.time())
+        row = self._lookup(identity, url)
+        
+        if row and row[0] > now - ttl:
+            return _cached_response(url, zlib.decompress(row[2]))
+        if row and row[1]:
+            headers = {**headers, 'If-None-Match': row[1]}
+        
+        response = await fetch(url, headers, session)
+        if response.status_code == 304 and row:
+            self._touch(identity, url, now)
+            return _cached_response(url, zlib.decompress(row[2]))
+        if response.status_code == 200:
+            self._store(identity, url, now, response.headers.get('ETag'), response.content)
+        return response
+    
+    async def batch(self, headers, subrequests, ttl, session=session):
+        """Run graph_batch GETs through the cache.
+        
+        As with get_or_fetch, copies younger than ttl seconds are served
+        without a request and older ones are revalidated with If-None-Match
+        inside the batch; a 304 sub-response is answered from the cache.
+        
+        Args:
+            headers: Graph request headers
+            subrequests: List of (id, relative URL) tuples
+            ttl: Seconds a cached copy is used without revalidating it
+            session: requests.Session to send the batches on
+            
+        Returns:
+            Dict of sub-request id to its response ({'status': ..., 'body': ...})
+        """
+        identity = _cache_identity(headers)
+        if identity is None:
+            return await graph_batch(headers, subrequests, session)
+        now = int(time.time())
+        results = {}
+        stale = {}
+        pending = []
+        urls = {}
+        
+        for rid, path in subrequests:
+            url = urls[rid] = f'{GRAPH}{path}'
+            row = self._lookup(identity, url)
+            if row and row[0] > now - ttl:
+                results[rid] = {'id': rid, 'status': 200, 'body': loads(zlib.decompress(row[2]))}
+            elif row and row[1]:
+                stale[rid] = row
+                pending.append((rid, path, {'If-None-Match': row[1]}))
+            else:
+                pending.append((rid, path))
+        
+        for rid, sub_response in (await graph_batch(headers, pending, session)).items():
+            status = sub_response.get('status')
+            if status == 304 and rid in stale:
+                self._touch(identity, urls[rid], now)
+                sub_response = {'id': rid, 'status': 200, 'body': loads(zlib.decompress(stale[rid][2]))}
+            elif status == 200:
+                self._store(
+                    identity, urls[rid], now, sub_response.get('headers', {}).get('ETag'),
+                    dumps(sub_response.get('body', {}))
+                )
+            results[rid] = sub_response
+        return results
+
+graph_cache = GraphCache()
+
+async def cached_fetch(url, headers, session=session):
+    """GET a Graph discovery URL through the shared cache (fresh for DISCOVERY_MAX_AGE)."""
+    return await graph_cache.get_or_fetch(url, headers, DISCOVERY_MAX_AGE, session)
+
+async def fetch_all(urls, headers, session=session):
+    """GET several Graph URLs concurrently.
+    
+    Returns:
+        List of responses in the same order as urls
+    """
+    return await asyncio.gather(*(fetch(url, headers, session) for url in urls))
+
+def _stream_items(raw, page):
+    """Yield the `value` items of a streamed Graph collection body as they are parsed.
+    
+    Top-level @odata.nextLink is recorded into page, wherever it appears in the body.
+    """
+    events = ijson.parse(raw)
+    for prefix, event, value in events:
+        if prefix == '@odata.nextLink':
+            page['@odata.nextLink'] = value
+        elif prefix == 'value.item' and event == 'start_map':
+            builder = ijson.ObjectBuilder()
+            while (prefix, event) != ('value.item', 'end_map'):
+                builder.event(event, value)
+                prefix, event, value = next(events)
+            yield builder.value
+
+def _take(items, count):
+    return list(itertools.islice(items, count))
+
+# Shape shared by every $batch sub-request; only the id and URL vary
+_BATCH_REQUEST = {'id': '', 'method': 'GET', 'url': ''}
+
+def _batch_request(rid, url, headers=None):
+    request = {**_BATCH_REQUEST, 'id': rid, 'url': url}
+    if headers:
+        request['headers'] = headers
+    return request
+
+async def graph_batch(headers, subrequests, session=session, max_retries=3):
+    """Run GET requests through Graph JSON batching, 20 per round trip.
+    
+    Batches are posted on the thread pool, and every sub-request takes a
+    token from the shared limiter since Graph throttles them individually.
+    Sub-requests throttled with 429 are retried after their Retry-After delay.
+    
+    Args:
+        headers: Graph request headers
+        subrequests: List of (id, relative URL) tuples, e.g. ('d0', '/users/{id}/drive'),
+            optionally with a third item holding extra sub-request headers
+        session: requests.Session to send the batches on
+        max_retries: How many times to retry throttled sub-requests
+        
+    Returns:
+        Dict of sub-request id to its response ({'status': ..., 'body': ...})
+    """
+    loop = asyncio.get_running_loop()
+    results = {}
+    pending = list(subrequests)
+    post_headers = {**headers, 'Content-Type': 'application/json'}
+    
+    for attempt in range(max_retries + 1):
+        throttled = []
+        retry_after = 0
+        
+        for start in range(0, len(pending), GRAPH_BATCH_LIMIT):
+            chunk = pending[start:start + GRAPH_BATCH_LIMIT]
+            for _ in chunk:
+                await limiter.acquire()
+            response = await loop.run_in_executor(_executor, functools.partial(
+                session.post,
+                GRAPH_BATCH_URL,
+                headers=post_headers,
+                data=dumps({'requests': [_batch_request(*subrequest) for subrequest in chunk]})
+            ))
+            if response.status_code != 200:
+                for rid, *_ in chunk:
+                    results[rid] = {'status': response.status_code, 'body': {}}
+                continue
+            
+            by_id = {subrequest[0]: subrequest for subrequest in chunk}
+            for sub_response in loads(response.content).get('responses', []):
+                if sub_response.get('status') == 429 and attempt < max_retries:
+                    throttled.append(by_id[sub_response['id']])
+                    try:
+                        delay = int(sub_response.get('headers', {}).get('Retry-After', 1))
+                    except ValueError:
+                        delay = 1
+                    retry_after = max(retry_after, delay)
+                else:
+                    results[sub_response['id']] = sub_response
+        
+        if not throttled:
+            break
+        limiter.defer(retry_after)
+        await asyncio.sleep(retry_after)
+        pending = throttled
+    
+    return results
+
+async def paged(url, headers, session=session, page=None):
+    """Yield the items of a Graph collection, following @odata.nextLink.
+    
+    Items are streamed page by page, so only one page is held in memory.
+    With ijson installed, pages fetched here are decoded item by item from
+    the response stream instead, and a consumer that stops early leaves the
+    rest of the body undownloaded.
+    
+    Args:
+        url: Collection URL to start from
+        headers: Graph request headers
+        session: requests.Session to send the requests on
+        page: Already fetched first page, parsed or as raw body bytes; url is
+            not requested if given
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        if page is None:
+            response = await fetch(url, headers, session, stream=ijson is not None)
+            if ijson is not None:
+                page = {}
+                try:
+                    response.raise_for_status()
+                    response.raw.decode_content = True
+                    # Reading the stream blocks, so parse it in batches on the thread pool
+                    items = _stream_items(response.raw, page)
+                    while True:
+                        batch = await loop.run_in_executor(_executor, _take, items, STREAM_BATCH_SIZE)
+                        if not batch:
+                            break
+                        for item in batch:
+                            yield item
+                finally:
+                    response.close()
+            else:
+                response.raise_for_status()
+                page = loads(response.content)
+        elif isinstance(page, bytes):
+            # Already fully in memory, so a whole-page decode is cheapest
+            page = loads(page)
+        # Streamed pages only carry the nextLink here; their items are already out
+        for item in page.get('value', []):
+            yield item
+        url = page.get('@odata.nextLink')
+        if not url:
+            return
+        page = None
+
+async def head_and_count(items, limit):
+    """Drain an async item stream, keeping only the first few items.
+    
+    Returns:
+        Tuple of (first `limit` items, total item count)
+    """
+    head = []
+    count = 0
+    async for item in items:
+        if count < limit:
+            head.append(item)
+        count += 1
+    return head, count
+
+def start_log_listener():
+    """Route INFO logging through a queue to a background thread writing stdout.
+    
+    Concurrent request handlers then only enqueue records instead of
+    contending for stdout.
+    
+    Returns:
+        The started QueueListener; stop() it to flush pending output
+    """
+    log_queue = queue.Queue()
+    logging.basicConfig(level=logging.INFO, format='%(message)s', handlers=[QueueHandler(log_queue)])
+    listener = QueueListener(log_queue, logging.StreamHandler(sys.stdout))
+    listener.start()
+    return listener
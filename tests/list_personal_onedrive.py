@@ -8,6 +8,9 @@ using different methods to find your specific user account.
 
 import sys
 import asyncio
+import functools
+import math
+from collections import defaultdict
 from pathlib import Path
 
 # Add src to Python path
@@ -15,83 +18,214 @@ sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
 from onedrive_backup.auth.microsoft_auth import MicrosoftGraphAuth
 from onedrive_backup.config.settings import CredentialsConfig
-import requests
-import json
+from graph_helpers import dumps, fetch, loads, write_private_file
 
+SIZE_NAMES = ("B", "KB", "MB", "GB", "TB")
+
+@functools.lru_cache(maxsize=4096)
 def format_file_size(size_bytes):
     """Format file size in human readable format."""
     if size_bytes == 0:
         return "0 B"
-    size_names = ["B", "KB", "MB", "GB", "TB"]
-    i = 0
-    while size_bytes >= 1024 and i < len(size_names) - 1:
-        size_bytes /= 1024.0
-        i += 1
-    return f"{size_bytes:.1f} {size_names[i]}"
+    # Each unit is 2**10 larger than the previous one
+    i = min(int(math.log2(max(size_bytes, 1))) // 10, len(SIZE_NAMES) - 1)
+    return f"{size_bytes / (1 << (i * 10)):.1f} {SIZE_NAMES[i]}"
 
-def list_folder_contents(headers, drive_id, folder_id="root", level=0, max_level=2):
-    """List contents of a folder."""
-    if level > max_level:
-        return 0, 0  # files, folders
+EMOJI_BY_EXT = {
+    'jpg': '🖼️', 'jpeg': '🖼️', 'png': '🖼️', 'gif': '🖼️',
+    'doc': '📝', 'docx': '📝',
+    'xls': '📊', 'xlsx': '📊',
+    'ppt': '📽️', 'pptx': '📽️',
+    'pdf': '📑',
+}
+
+OUTPUT_FLUSH_LINES = 1024  # Buffered output lines written per stdout call
+
+DELTA_SELECT = "id,name,size,folder,root,deleted,parentReference,lastModifiedDateTime"
+# One file per drive, so each drive's state is read and written on its own
+DELTA_CACHE_DIR = Path(__file__).parent / ".delta_cache"
+
+def load_delta_state(drive_id):
+    """Load a drive's cached items and delta link from previous runs."""
+    path = DELTA_CACHE_DIR / f"{drive_id}.json"
+    if path.exists():
+        try:
+            with open(path, 'rb') as f:
+                return loads(f.read())
+        except (OSError, ValueError):
+            pass
+    return {}
+
+def save_delta_state(drive_id, state):
+    """Persist a drive's items and delta link for the next run.
     
-    indent = "  " * level
+    Items list every user's file names, so the file is private to the
+    current user and swapped in atomically.
+    """
+    DELTA_CACHE_DIR.mkdir(exist_ok=True)
+    write_private_file(DELTA_CACHE_DIR / f"{drive_id}.json", dumps(state))
+
+async def fetch_drive_items(headers, drive_id):
+    """Fetch every item in a drive through the delta API.
     
-    if folder_id == "root":
-        endpoint = f'https://graph.microsoft.com/v1.0/drives/{drive_id}/root/children'
-    else:
-        endpoint = f'https://graph.microsoft.com/v1.0/drives/{drive_id}/items/{folder_id}/children'
+    The first run pages through the whole drive; later runs resume from the
+    delta link cached for the drive and only transfer what changed since then.
     
-    response = requests.get(endpoint, headers=headers)
+    Pages have to be followed one at a time: drive item collections only
+    paginate through opaque @odata.nextLink tokens and do not accept $skip,
+    so parallelism is applied across drives (see fetch_drives) instead.
+    
+    Returns:
+        Dict of item ID to DriveItem, or None if the drive cannot be read
+    """
+    state = await asyncio.to_thread(load_delta_state, drive_id)
+    items = state.get('items', {})
+    fresh_endpoint = f'https://graph.microsoft.com/v1.0/drives/{drive_id}/root/delta?$select={DELTA_SELECT}'
+    endpoint = state.get('delta_link') or fresh_endpoint
+    delta_link = None
+    
+    while endpoint:
+        response = await fetch(endpoint, headers)
+        
+        if response.status_code == 410 and state:
+            # Cached delta link expired - start over with a full sync
+            state = {}
+            items = {}
+            endpoint = fresh_endpoint
+            continue
+        
+        if response.status_code != 200:
+            print(f"❌ Cannot access folder: {response.status_code}")
+            return None
+        
+        data = loads(response.content)
+        for item in data.get('value', []):
+            if item.get('deleted'):
+                items.pop(item.get('id'), None)
+            else:
+                items[item.get('id')] = item
+        
+        endpoint = data.get('@odata.nextLink')
+        delta_link = data.get('@odata.deltaLink')
+    
+    if delta_link:
+        await asyncio.to_thread(save_delta_state, drive_id, {'delta_link': delta_link, 'items': items})
+    
+    return items
+
+async def fetch_drives(headers, drive_ids):
+    """Fetch the items of several drives concurrently.
+    
+    Requests go through graph_helpers.fetch, so the shared connection pool and
+    rate limiter bound how many are in flight.
+    
+    Returns:
+        Dict of drive ID to item dict (None for drives that cannot be read)
+    """
+    results = await asyncio.gather(*(fetch_drive_items(headers, drive_id) for drive_id in drive_ids))
+    return dict(zip(drive_ids, results))
+
+def is_personal_drive(drive):
+    """Check whether a drive looks like a personal OneDrive."""
+    return (drive.get('driveType', 'N/A') == 'business' or
+            'onedrive' in drive.get('name', 'N/A').lower() or
+            drive.get('owner', {}).get('user', {}).get('displayName'))
+
+def index_drive_items(items):
+    """Bucket drive items by parent ID.
+    
+    Returns:
+        Tuple of (root item ID, dict of parent ID to child items)
+    """
+    root_id = None
+    children_by_parent = defaultdict(list)
+    for item in items.values():
+        if 'root' in item:
+            root_id = item.get('id')
+        else:
+            children_by_parent[item.get('parentReference', {}).get('id')].append(item)
+    for children in children_by_parent.values():
+        children.sort(key=lambda child: child.get('name', '').lower())
+    return root_id, children_by_parent
+
+def render_folder(children_by_parent, folder_id, level=0, max_level=2, buf=None):
+    """Render the contents of a folder from the in-memory drive index.
+    
+    The tree is walked depth-first with an explicit stack of child iterators,
+    so deep hierarchies cannot hit Python's recursion limit. Output lines are
+    appended to buf and written to stdout in batches of OUTPUT_FLUSH_LINES
+    rather than one print() per line.
+    """
+    if buf is None:
+        buf = []
+    if level > max_level:
+        return 0, 0  # files, folders
     
     file_count = 0
     folder_count = 0
     
-    if response.status_code == 200:
-        items = response.json()
+    stack = [(iter(children_by_parent.get(folder_id, [])), level)]
+    while stack:
+        children, depth = stack[-1]
+        item = next(children, None)
+        if item is None:
+            stack.pop()
+            continue
         
-        for item in items.get('value', []):
-            name = item.get('name', 'N/A')
-            size = item.get('size', 0)
-            modified = item.get('lastModifiedDateTime', 'N/A')
+        indent = "  " * depth
+        
+        if len(buf) >= OUTPUT_FLUSH_LINES:
+            sys.stdout.writelines(buf)
+            buf.clear()
+        
+        name = item.get('name', 'N/A')
+        size = item.get('size', 0)
+        modified = item.get('lastModifiedDateTime', 'N/A')
+        
+        if modified != 'N/A':
+            modified = modified[:19].replace('T', ' ')
+        
+        if item.get('folder'):
+            folder_count += 1
+            child_count = item.get('folder', {}).get('childCount', 0)
+            buf.append(f"{indent}📁 {name}/ ({child_count} items)\n")
+            buf.append(f"{indent}   Modified: {modified}\n")
             
-            if modified != 'N/A':
-                modified = modified[:19].replace('T', ' ')
+            # Descend into the folder before continuing with its siblings
+            if depth < max_level and children_by_parent.get(item.get('id')):
+                stack.append((iter(children_by_parent[item.get('id')]), depth + 1))
+        else:
+            file_count += 1
+            dot = name.rfind('.')
+            file_ext = name[dot + 1:].lower() if dot >= 0 else ""
+            file_type = EMOJI_BY_EXT.get(file_ext, "📄")
             
-            if item.get('folder'):
-                folder_count += 1
-                child_count = item.get('folder', {}).get('childCount', 0)
-                print(f"{indent}📁 {name}/ ({child_count} items)")
-                print(f"{indent}   Modified: {modified}")
-                
-                # Recursively count contents
-                if level < max_level and child_count > 0:
-                    sub_files, sub_folders = list_folder_contents(headers, drive_id, item.get('id'), level + 1, max_level)
-                    file_count += sub_files
-                    folder_count += sub_folders
-            else:
-                file_count += 1
-                file_type = "📄"
-                file_ext = name.split('.')[-1].lower() if '.' in name else ""
-                
-                if file_ext in ['jpg', 'jpeg', 'png', 'gif']:
-                    file_type = "🖼️"
-                elif file_ext in ['doc', 'docx']:
-                    file_type = "📝"
-                elif file_ext in ['xls', 'xlsx']:
-                    file_type = "📊"
-                elif file_ext in ['ppt', 'pptx']:
-                    file_type = "📽️"
-                elif file_ext in ['pdf']:
-                    file_type = "📑"
-                
-                print(f"{indent}{file_type} {name}")
-                print(f"{indent}   Size: {format_file_size(size)}")
-                print(f"{indent}   Modified: {modified}")
-    else:
-        print(f"{indent}❌ Cannot access folder: {response.status_code}")
+            buf.append(f"{indent}{file_type} {name}\n")
+            buf.append(f"{indent}   Size: {format_file_size(size)}\n")
+            buf.append(f"{indent}   Modified: {modified}\n")
     
     return file_count, folder_count
 
+async def list_folder_contents(headers, drive_id, folder_id="root", level=0, max_level=2, items=None):
+    """List contents of a folder.
+    
+    items may be passed in when the drive was already fetched with fetch_drives.
+    """
+    if items is None:
+        items = (await fetch_drives(headers, [drive_id]))[drive_id]
+    if items is None:
+        return 0, 0  # files, folders
+    
+    root_id, children_by_parent = index_drive_items(items)
+    if folder_id == "root":
+        folder_id = root_id
+    
+    buf = []
+    counts = render_folder(children_by_parent, folder_id, level, max_level, buf)
+    sys.stdout.writelines(buf)
+    sys.stdout.flush()
+    return counts
+
 async def list_personal_onedrive():
     """Find and list personal OneDrive for Business files."""
     print("🚀 Personal OneDrive for Business File Listing")
@@ -121,14 +255,20 @@ async def list_personal_onedrive():
         
         # Method 1: Try to find your personal OneDrive through drives
         print("\n🔍 Method 1: Looking for personal OneDrive drives...")
-        response = requests.get('https://graph.microsoft.com/v1.0/drives', headers=headers)
+        response = await fetch('https://graph.microsoft.com/v1.0/drives', headers)
         
         personal_onedrive_found = False
         
         if response.status_code == 200:
-            drives = response.json()
+            drives = loads(response.content)
             print(f'Found {len(drives.get("value", []))} drives total')
             
+            # Fetch all candidate drives in parallel, then render them in order
+            drive_items = await fetch_drives(
+                headers,
+                [drive.get('id', 'N/A') for drive in drives.get('value', []) if is_personal_drive(drive)]
+            )
+            
             for drive in drives.get('value', []):
                 drive_name = drive.get('name', 'N/A')
                 drive_type = drive.get('driveType', 'N/A')
@@ -136,9 +276,7 @@ async def list_personal_onedrive():
                 owner = drive.get('owner', {})
                 
                 # Look for personal OneDrive indicators
-                if (drive_type == 'business' or 
-                    'onedrive' in drive_name.lower() or
-                    owner.get('user', {}).get('displayName')):
+                if is_personal_drive(drive):
                     
                     print(f"\n📂 Potential Personal OneDrive Found:")
                     print(f"   Name: {drive_name}")
@@ -162,7 +300,8 @@ async def list_personal_onedrive():
                     print(f"\n   📋 Contents:")
                     print(f"   {'-' * 40}")
                     
-                    file_count, folder_count = list_folder_contents(headers, drive_id, "root", 0, 2)
+                    file_count, folder_count = await list_folder_contents(headers, drive_id, "root", 0, 2,
+                                                                          items=drive_items.get(drive_id))
                     
                     print(f"\n   📊 Summary:")
                     print(f"   Files: {file_count}")
@@ -174,9 +313,9 @@ async def list_personal_onedrive():
         if not personal_onedrive_found:
             print("\n🔍 Method 2: Looking through SharePoint for OneDrive...")
             
-            sites_response = requests.get('https://graph.microsoft.com/v1.0/sites?search=*', headers=headers)
+            sites_response = await fetch('https://graph.microsoft.com/v1.0/sites?search=*', headers)
             if sites_response.status_code == 200:
-                sites = sites_response.json()
+                sites = loads(sites_response.content)
                 
                 for site in sites.get('value', []):
                     site_name = site.get('displayName', '')
@@ -192,10 +331,14 @@ async def list_personal_onedrive():
                         
                         site_id = site.get('id')
                         if site_id:
-                            drives_response = requests.get(f'https://graph.microsoft.com/v1.0/sites/{site_id}/drives', headers=headers)
+                            drives_response = await fetch(f'https://graph.microsoft.com/v1.0/sites/{site_id}/drives', headers)
                             
                             if drives_response.status_code == 200:
-                                site_drives = drives_response.json()
+                                site_drives = loads(drives_response.content)
+                                drive_items = await fetch_drives(
+                                    headers,
+                                    [drive.get('id', 'N/A') for drive in site_drives.get('value', [])]
+                                )
                                 
                                 for drive in site_drives.get('value', []):
                                     drive_name = drive.get('name', 'N/A')
@@ -205,7 +348,8 @@ async def list_personal_onedrive():
                                     print(f"\n   📁 Drive: {drive_name} (Type: {drive_type})")
                                     
                                     # List files
-                                    file_count, folder_count = list_folder_contents(headers, drive_id, "root", 1, 2)
+                                    file_count, folder_count = await list_folder_contents(headers, drive_id, "root", 1, 2,
+                                                                                          items=drive_items.get(drive_id))
                                     
                                     print(f"\n   📊 Drive Summary:")
                                     print(f"   Files: {file_count}")
@@ -218,14 +362,14 @@ async def list_personal_onedrive():
             print("\n🔍 Method 3: Trying to find your user account...")
             
             # Try to get the app service principal to find the user
-            me_response = requests.get('https://graph.microsoft.com/v1.0/me', headers=headers)
+            me_response = await fetch('https://graph.microsoft.com/v1.0/me', headers)
             if me_response.status_code != 200:
                 print("   Cannot use /me endpoint with app-only auth (expected)")
             
             # Try to get users (may fail due to permissions)
-            users_response = requests.get('https://graph.microsoft.com/v1.0/users?$top=5', headers=headers)
+            users_response = await fetch('https://graph.microsoft.com/v1.0/users?$top=5', headers)
             if users_response.status_code == 200:
-                users = users_response.json()
+                users = loads(users_response.content)
                 print(f"   Found {len(users.get('value', []))} users")
                 
                 for user in users.get('value', [])[:3]:  # Check first 3 users
@@ -236,10 +380,10 @@ async def list_personal_onedrive():
                     print(f"\n   👤 User: {user_name} ({user_email})")
                     
                     # Try to access their OneDrive
-                    user_drive_response = requests.get(f'https://graph.microsoft.com/v1.0/users/{user_id}/drive', headers=headers)
+                    user_drive_response = await fetch(f'https://graph.microsoft.com/v1.0/users/{user_id}/drive', headers)
                     
                     if user_drive_response.status_code == 200:
-                        drive_info = user_drive_response.json()
+                        drive_info = loads(user_drive_response.content)
                         drive_name = drive_info.get('name', 'N/A')
                         drive_type = drive_info.get('driveType', 'N/A')
                         drive_id = drive_info.get('id', 'N/A')
@@ -247,7 +391,7 @@ async def list_personal_onedrive():
                         print(f"      ✅ OneDrive: {drive_name} (Type: {drive_type})")
                         
                         # List files
-                        file_count, folder_count = list_folder_contents(headers, drive_id, "root", 2, 3)
+                        file_count, folder_count = await list_folder_contents(headers, drive_id, "root", 2, 3)
                         
                         print(f"\n      📊 OneDrive Summary:")
                         print(f"      Files: {file_count}")
@@ -7,6 +7,7 @@ to verify backup destinations are accessible.
 """
 
 import sys
+import io
 import asyncio
 from pathlib import Path
 
@@ -14,13 +15,72 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
 from onedrive_backup.config.settings import CredentialsConfig
+from onedrive_backup.destinations import S3BatchDeleter
 import boto3
+from boto3.s3.transfer import TransferConfig
 from azure.storage.blob import BlobServiceClient
 import requests
+import xml.etree.ElementTree as ET
 from datetime import datetime
 
-def test_aws_s3_connection(aws_access_key_id, aws_secret_access_key, bucket_name="test-bucket", region="us-east-1"):
-    """Test AWS S3 connection."""
+def count_blob_names(response):
+    """Count <Name> elements in a streamed List Blobs response without buffering the body."""
+    response.raw.decode_content = True  # Let urllib3 undo any gzip content encoding
+    blob_count = 0
+    for _, element in ET.iterparse(response.raw, events=('end',)):
+        if element.tag == 'Name':
+            blob_count += 1
+        element.clear()
+    return blob_count
+
+class SasBlobUploader:
+    """Upload blobs to a container addressed by a SAS URL.
+    
+    The SAS URL is split into base URL and token once, so building a blob URL
+    is a single f-string, and all requests share one keep-alive session.
+    """
+    
+    def __init__(self, sas_url):
+        self._base, _, self._sas = sas_url.partition('?')
+        self._session = requests.Session()
+    
+    def blob_url(self, blob_name):
+        """Build the SAS URL for a blob in the container."""
+        return f"{self._base}/{blob_name}?{self._sas}"
+    
+    def list_blobs(self, max_results=10):
+        """Start a streamed List Blobs request."""
+        return self._session.get(
+            f"{self._base}?{self._sas}&restype=container&comp=list&maxresults={max_results}",
+            timeout=30,
+            stream=True
+        )
+    
+    def upload(self, blob_name, data, content_type='application/octet-stream'):
+        """Upload data as a block blob."""
+        return self._session.put(
+            self.blob_url(blob_name),
+            data=data,
+            headers={
+                'x-ms-blob-type': 'BlockBlob',
+                'Content-Type': content_type
+            },
+            timeout=30
+        )
+    
+    def delete(self, blob_name):
+        """Delete a blob."""
+        return self._session.delete(self.blob_url(blob_name), timeout=30)
+
+MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+
+def test_aws_s3_connection(aws_access_key_id, aws_secret_access_key, bucket_name="test-bucket", region="us-east-1",
+                           max_concurrency=10):
+    """Test AWS S3 connection.
+    
+    Uploads go through upload_fileobj so payloads above MULTIPART_CHUNK_SIZE
+    are sent as parallel multipart uploads using up to max_concurrency threads.
+    """
     print("🔍 Testing AWS S3 Connection...")
     
     try:
@@ -48,6 +108,13 @@ def test_aws_s3_connection(aws_access_key_id, aws_secret_access_key, bucket_name
         # if len(buckets) > 5:
         #     print(f"      ... and {len(buckets) - 5} more buckets")
         
+        transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_CHUNK_SIZE,
+            multipart_chunksize=MULTIPART_CHUNK_SIZE,
+            max_concurrency=max_concurrency,
+            use_threads=True
+        )
+        
         # Test upload capability with a small test file
         test_bucket = 'bernoulli_backup'  # Change to an existing bucket for testing
         if test_bucket:
@@ -56,17 +123,22 @@ def test_aws_s3_connection(aws_access_key_id, aws_secret_access_key, bucket_name
             test_content = f"OneDrive Backup Test - {datetime.now()}"
             
             try:
-                s3_client.put_object(
-                    Bucket=test_bucket,
-                    Key=test_key,
-                    Body=test_content.encode('utf-8'),
-                    ContentType='text/plain'
+                s3_client.upload_fileobj(
+                    io.BytesIO(test_content.encode('utf-8')),
+                    test_bucket,
+                    test_key,
+                    ExtraArgs={'ContentType': 'text/plain'},
+                    Config=transfer_config
                 )
                 print(f"✅ Upload test successful: {test_key}")
                 
                 # Clean up test file
-                s3_client.delete_object(Bucket=test_bucket, Key=test_key)
-                print(f"✅ Cleanup successful")
+                with S3BatchDeleter(s3_client, test_bucket) as deleter:
+                    deleter.delete(test_key)
+                if deleter.errors:
+                    print(f"⚠️  Cleanup warning: {deleter.errors[0].get('Message')}")
+                else:
+                    print(f"✅ Cleanup successful")
                 
             except Exception as upload_error:
                 print(f"⚠️  Upload test failed: {upload_error}")
@@ -91,19 +163,18 @@ def test_azure_blob_connection(connection_string_or_url):
             url_parts = connection_string_or_url.split('/')
             account_container = '/'.join(url_parts[3:5])  # account/container
             
+            uploader = SasBlobUploader(connection_string_or_url)
+            
             # Test by making a simple request to list blobs
             print("   Attempting to list blobs...")
-            response = requests.get(
-                connection_string_or_url + "&restype=container&comp=list&maxresults=10",
-                timeout=30
-            )
+            response = uploader.list_blobs(max_results=10)
             
             if response.status_code == 200:
                 print(f"✅ Azure Blob Storage Connection successful!")
                 print(f"   📦 Container accessible: {account_container}")
                 
-                # Parse blob count from XML response
-                blob_count = response.text.count('<Name>')
+                # Parse blob count from XML response as it streams in
+                blob_count = count_blob_names(response)
                 print(f"   📄 Found {blob_count} blobs in container")
                 
                 # Test upload capability
@@ -111,23 +182,13 @@ def test_azure_blob_connection(connection_string_or_url):
                 test_blob_name = f"test-backup-{datetime.now().strftime('%Y%m%d-%H%M%S')}.txt"
                 test_content = f"OneDrive Backup Test - {datetime.now()}"
                 
-                upload_url = connection_string_or_url.split('?')[0] + f"/{test_blob_name}?" + connection_string_or_url.split('?')[1]
-                
-                upload_response = requests.put(
-                    upload_url,
-                    data=test_content.encode('utf-8'),
-                    headers={
-                        'x-ms-blob-type': 'BlockBlob',
-                        'Content-Type': 'text/plain'
-                    },
-                    timeout=30
-                )
+                upload_response = uploader.upload(test_blob_name, test_content.encode('utf-8'), 'text/plain')
                 
                 if upload_response.status_code in [201, 200]:
                     print(f"✅ Upload test successful: {test_blob_name}")
                     
                     # Clean up test file
-                    delete_response = requests.delete(upload_url, timeout=30)
+                    delete_response = uploader.delete(test_blob_name)
                     if delete_response.status_code in [202, 200]:
                         print(f"✅ Cleanup successful")
                     else:
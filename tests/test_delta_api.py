@@ -1,67 +1,150 @@
 """Test Microsoft Graph Delta API for incremental changes."""
 
+import asyncio
 import json
+import os
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
 
-import requests
-from msal import ConfidentialClientApplication
+# Add src to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
-# Load credentials
-with open('config/credentials.yaml', 'r') as f:
-    import yaml
-    creds = yaml.safe_load(f)
-
-# Get access token
-app = ConfidentialClientApplication(
-    creds['microsoft_app_id'],
-    authority=f"https://login.microsoftonline.com/{creds['microsoft_tenant_id']}",
-    client_credential=creds['microsoft_app_secret']
-)
+from onedrive_backup.auth.microsoft_auth import MicrosoftGraphAuth
+from graph_helpers import GRAPH_BATCH_LIMIT, dumps, graph_batch, loads, session, write_private_file
 
-result = app.acquire_token_for_client(scopes=["https://graph.microsoft.com/.default"])
-token = result['access_token']
+# Per-tenant cache of which users have a OneDrive, so re-runs skip the probe sweep
+DRIVE_PROBE_CACHE_PATH = 'tests/.graph_cache.json'
+DRIVE_PROBE_CACHE_TTL = 24 * 3600  # seconds
 
-headers = {
-    'Authorization': f'Bearer {token}',
-    'Content-Type': 'application/json'
-}
+# Only enabled accounts can own a drive, and only these fields are used below
+USERS_URL = (
+    'https://graph.microsoft.com/v1.0/users'
+    '?$select=id,mail,userPrincipalName&$filter=accountEnabled eq true&$top=999'
+)
 
-# Get user ID with OneDrive
-print("Finding users with OneDrive...")
-users_response = requests.get('https://graph.microsoft.com/v1.0/users?$top=999', headers=headers)
-all_users = users_response.json()['value']
+@lru_cache(maxsize=1)
+def load_credentials():
+    """Load credentials from config/credentials.yaml."""
+    import yaml
+    with open('config/credentials.yaml', 'r') as f:
+        return yaml.safe_load(f)
 
-# Find user with OneDrive
-user_id = None
-user_email = None
-for user in all_users:
-    test_user_id = user['id']
-    # Try to get drive
-    drive_response = requests.get(
-        f'https://graph.microsoft.com/v1.0/users/{test_user_id}/drive',
-        headers=headers
+@lru_cache(maxsize=1)
+def get_token():
+    """Get an access token (served from the persisted MSAL cache while still valid)."""
+    creds = load_credentials()
+    auth = MicrosoftGraphAuth(
+        app_id=creds['microsoft_app_id'],
+        app_secret=creds['microsoft_app_secret'],
+        tenant_id=creds['microsoft_tenant_id']
     )
-    if drive_response.status_code == 200:
-        user_id = test_user_id
-        user_email = user.get('mail') or user.get('userPrincipalName')
-        print(f"✅ Found user with OneDrive: {user_email} ({user_id})\n")
-        break
-
-if not user_id:
-    print("❌ No users with OneDrive found!")
-    exit(1)
+    return auth.get_access_token()
 
-# Test 1: Get initial delta
-print("=" * 70)
-print("TEST 1: Initial Delta Call")
-print("=" * 70)
-delta_url = f'https://graph.microsoft.com/v1.0/users/{user_id}/drive/root/delta'
-print(f"GET {delta_url}\n")
+def get_headers(token):
+    """Build Graph request headers for a token."""
+    return {
+        'Authorization': f'Bearer {token}',
+        'Content-Type': 'application/json'
+    }
 
-response = requests.get(delta_url, headers=headers)
-print(f"Status Code: {response.status_code}")
+@lru_cache(maxsize=1)
+def find_onedrive_user(token):
+    """Find a user with a OneDrive.
+    
+    Returns:
+        Tuple of (user ID, email), or (None, None) if no user has a drive
+    """
+    headers = get_headers(token)
+    
+    # Load cached drive probe results for this tenant
+    tenant_id = load_credentials()['microsoft_tenant_id']
+    probe_cache = {}
+    if os.path.exists(DRIVE_PROBE_CACHE_PATH):
+        try:
+            with open(DRIVE_PROBE_CACHE_PATH, 'r') as f:
+                probe_cache = json.load(f)
+        except (OSError, ValueError):
+            # Unreadable or truncated cache; probe again from scratch
+            probe_cache = {}
+    now = time.time()
+    drive_cache = {
+        uid: entry for uid, entry in probe_cache.get(tenant_id, {}).items()
+        if now - entry['checked'] < DRIVE_PROBE_CACHE_TTL
+    }
+    
+    # Get user ID with OneDrive
+    print("Finding users with OneDrive...")
+    all_users = []
+    users_url = USERS_URL
+    while users_url:
+        users_response = session.get(users_url, headers=headers)
+        users_data = loads(users_response.content)
+        all_users.extend(users_data['value'])
+        users_url = users_data.get('@odata.nextLink')
+    
+    # Only probe users known to have a drive (to re-validate) and users not seen before
+    known_drive = {uid for uid, entry in drive_cache.items() if entry['has_drive']}
+    known_no_drive = {uid for uid, entry in drive_cache.items() if not entry['has_drive']}
+    candidates = [user for user in all_users if user['id'] in known_drive]
+    candidates += [user for user in all_users if user['id'] not in known_drive and user['id'] not in known_no_drive]
+    
+    # Find user with OneDrive, probing up to GRAPH_BATCH_LIMIT drives per request
+    # so the sweep stops at the first batch that finds one. Throttled probes are
+    # retried by graph_batch; any still unanswered are simply not cached.
+    user_id = None
+    user_email = None
+    for start in range(0, len(candidates), GRAPH_BATCH_LIMIT):
+        batch_users = candidates[start:start + GRAPH_BATCH_LIMIT]
+        results = asyncio.run(graph_batch(headers, [
+            (str(i), f"/users/{user['id']}/drive?$select=id") for i, user in enumerate(batch_users)
+        ]))
+        statuses = [results.get(str(i), {}).get('status') for i in range(len(batch_users))]
+        if not any(status in (200, 404) for status in statuses):
+            print(f"❌ Drive probe batch failed: {statuses[0]}")
+            break
+        
+        for user, status in zip(batch_users, statuses):
+            if status in (200, 404):
+                drive_cache[user['id']] = {'has_drive': status == 200, 'checked': now}
+            if status == 200 and not user_id:
+                user_id = user['id']
+                user_email = user.get('mail') or user.get('userPrincipalName')
+        
+        if user_id:
+            print(f"✅ Found user with OneDrive: {user_email} ({user_id})\n")
+            break
+    
+    probe_cache[tenant_id] = drive_cache
+    # Per-user drive facts; keep them private to the current user
+    write_private_file(DRIVE_PROBE_CACHE_PATH, dumps(probe_cache))
+    
+    return user_id, user_email
 
-if response.status_code == 200:
-    data = response.json()
+def run_delta_test(token, user_id):
+    """Run the initial delta call for a user's drive and save the delta link.
+    
+    Returns:
+        True if the delta API responded successfully
+    """
+    headers = get_headers(token)
+    
+    # Test 1: Get initial delta
+    print("=" * 70)
+    print("TEST 1: Initial Delta Call")
+    print("=" * 70)
+    delta_url = f'https://graph.microsoft.com/v1.0/users/{user_id}/drive/root/delta'
+    print(f"GET {delta_url}\n")
+    
+    response = session.get(delta_url, headers=headers)
+    print(f"Status Code: {response.status_code}")
+    
+    if response.status_code != 200:
+        print(f"Error: {response.text}")
+        return False
+    
+    data = loads(response.content)
     
     # Count items
     items = data.get('value', [])
@@ -102,6 +185,18 @@ if response.status_code == 200:
     print("1. Modify a file in OneDrive")
     print("2. Run this script again")
     print("3. It will use the saved delta link to get only changes")
+    return True
+
+def main():
+    """Main function."""
+    token = get_token()
+    user_id, _ = find_onedrive_user(token)
     
-else:
-    print(f"Error: {response.text}")
+    if not user_id:
+        print("❌ No users with OneDrive found!")
+        return 1
+    
+    return 0 if run_delta_test(token, user_id) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
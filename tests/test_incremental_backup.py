@@ -1,9 +1,13 @@
 """Test incremental backup by setting fake last backup timestamp."""
 
-import json
+import gzip
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 import boto3
+from botocore.config import Config
+
+from graph_helpers import dumps
 
 # AWS S3 Configuration (from your config)
 BUCKET_NAME = "bernoulli-backup"
@@ -15,10 +19,57 @@ SOURCES = [
     "Work OneDrive"
 ]
 
+# Max metadata uploads in flight (kept below the client's connection pool size)
+MAX_UPLOAD_WORKERS = 16
+
+# Shared S3 client; adaptive retries back off on S3 throttling
+s3_client = boto3.client('s3', config=Config(
+    max_pool_connections=50,
+    retries={'max_attempts': 10, 'mode': 'adaptive'}
+))
+
+def upload_source_metadata(source_name, timestamp):
+    """Upload the fake metadata file for one source.
+    
+    Returns:
+        Report text for this source, printed by the caller so that
+        concurrent uploads don't interleave their output
+    """
+    metadata_key = f"{PREFIX}.backup-metadata/{source_name}_last_backup.json".lstrip('/')
+    
+    metadata = {
+        'source_name': source_name,
+        'last_backup_time': timestamp,
+        'files_backed_up': 0,
+        'files_skipped': 0,
+        'bytes_transferred': 0,
+        'backup_duration_seconds': 0,
+        'note': 'Test metadata - simulating backup from 3 days ago'
+    }
+    
+    report = f"Uploading metadata for: {source_name}\n"
+    report += f"  S3 Key: s3://{BUCKET_NAME}/{metadata_key}\n"
+    
+    try:
+        s3_client.put_object(
+            Bucket=BUCKET_NAME,
+            Key=metadata_key,
+            Body=gzip.compress(dumps(metadata)),
+            ContentType='application/json',
+            ContentEncoding='gzip',
+            Metadata={
+                'source': 'onedrive-backup-test',
+                'type': 'backup-metadata'
+            }
+        )
+        report += f"  ✅ Successfully uploaded\n"
+    except Exception as e:
+        report += f"  ❌ Error: {e}\n"
+    
+    return report
+
 def upload_fake_metadata():
     """Upload fake metadata files with timestamp from 3 days ago."""
-    s3_client = boto3.client('s3')
-    
     # Calculate timestamp from 3 days ago
     three_days_ago = datetime.utcnow() - timedelta(days=3)
     timestamp = three_days_ago.isoformat() + 'Z'
@@ -26,36 +77,10 @@ def upload_fake_metadata():
     print(f"Setting last backup timestamp to: {timestamp}")
     print(f"This will retrieve files modified after: {three_days_ago.strftime('%Y-%m-%d %H:%M:%S UTC')}\n")
     
-    for source_name in SOURCES:
-        metadata_key = f"{PREFIX}.backup-metadata/{source_name}_last_backup.json".lstrip('/')
-        
-        metadata = {
-            'source_name': source_name,
-            'last_backup_time': timestamp,
-            'files_backed_up': 0,
-            'files_skipped': 0,
-            'bytes_transferred': 0,
-            'backup_duration_seconds': 0,
-            'note': 'Test metadata - simulating backup from 3 days ago'
-        }
-        
-        print(f"Uploading metadata for: {source_name}")
-        print(f"  S3 Key: s3://{BUCKET_NAME}/{metadata_key}")
-        
-        try:
-            s3_client.put_object(
-                Bucket=BUCKET_NAME,
-                Key=metadata_key,
-                Body=json.dumps(metadata, indent=2).encode('utf-8'),
-                ContentType='application/json',
-                Metadata={
-                    'source': 'onedrive-backup-test',
-                    'type': 'backup-metadata'
-                }
-            )
-            print(f"  ✅ Successfully uploaded\n")
-        except Exception as e:
-            print(f"  ❌ Error: {e}\n")
+    # Upload every source concurrently, then report in source order
+    with ThreadPoolExecutor(max_workers=min(MAX_UPLOAD_WORKERS, len(SOURCES))) as executor:
+        for report in executor.map(upload_source_metadata, SOURCES, [timestamp] * len(SOURCES)):
+            print(report)
 
 if __name__ == "__main__":
     print("=" * 70)
@@ -10,6 +10,7 @@ This test attempts to list OneDrive files using different approaches:
 
 import sys
 import asyncio
+import logging
 from pathlib import Path
 
 # Add src to Python path
@@ -17,20 +18,26 @@ sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
 from onedrive_backup.auth.microsoft_auth import MicrosoftGraphAuth
 from onedrive_backup.config.settings import CredentialsConfig
-import requests
+from graph_helpers import (
+    GRAPH, CHILDREN_QUERY, DRIVES_QUERY, SITES_QUERY, USERS_QUERY,
+    cached_fetch, error_message, fetch, fetch_all, graph_batch, head_and_count, is_app_only_token,
+    paged, session, start_log_listener
+)
 import json
 
-async def test_onedrive_files():
+log = logging.getLogger(__name__)
+
+async def test_onedrive_files(session=session):
     """Test different methods to access OneDrive files."""
-    print("🚀 OneDrive Files Discovery Test")
-    print("=" * 50)
+    log.info("🚀 OneDrive Files Discovery Test")
+    log.info("=" * 50)
     
     try:
         # Load credentials
         config_path = Path(__file__).parent.parent / "config" / "credentials.yaml"
         creds = CredentialsConfig.from_yaml(config_path)
         
-        print(f'✅ Credentials loaded successfully')
+        log.info(f'✅ Credentials loaded successfully')
         
         # Get authentication
         auth = MicrosoftGraphAuth(
@@ -39,81 +46,123 @@ async def test_onedrive_files():
             tenant_id=creds.microsoft_tenant_id
         )
         
+        # Reuses an unexpired token from the on-disk MSAL cache across runs
         token = auth.get_access_token()
         headers = {
             'Authorization': f'Bearer {token}',
             'Content-Type': 'application/json'
         }
         
-        print(f'✅ Access token obtained')
+        log.info(f'✅ Access token obtained')
         
-        # Method 1: Try direct personal OneDrive access (expected to fail)
-        print("\n🔍 Method 1: Direct personal OneDrive access...")
-        response = requests.get('https://graph.microsoft.com/v1.0/me/drive', headers=headers)
-        print(f'   Personal OneDrive API: {response.status_code}')
-        if response.status_code == 200:
-            drive_info = response.json()
-            print(f'   ✅ OneDrive Name: {drive_info.get("name", "N/A")}')
+        # Method 1: Try direct personal OneDrive access (/me has no user under app-only auth)
+        log.info("\n🔍 Method 1: Direct personal OneDrive access...")
+        if is_app_only_token(token):
+            log.info(f'   ⏭️  Skipped: app-only auth has no signed-in user for /me')
         else:
-            print(f'   ❌ Expected failure: {response.json().get("error", {}).get("message", "Unknown")}')
+            response = await fetch(f'{GRAPH}/me/drive', headers, session)
+            log.info(f'   Personal OneDrive API: {response.status_code}')
+            if response.status_code == 200:
+                drive_info = response.json()
+                log.info(f'   ✅ OneDrive Name: {drive_info.get("name", "N/A")}')
+            else:
+                log.info(f'   ❌ Expected failure: {error_message(response)}')
         
         # Method 2: Get all drives accessible to the app
-        print("\n🔍 Method 2: All accessible drives...")
-        response = requests.get('https://graph.microsoft.com/v1.0/drives', headers=headers)
-        print(f'   All drives API: {response.status_code}')
+        log.info("\n🔍 Method 2: All accessible drives...")
+        response = await cached_fetch(f'{GRAPH}/drives?{DRIVES_QUERY}&$top=10', headers, session)  # Show first 10
+        log.info(f'   All drives API: {response.status_code}')
         
         if response.status_code == 200:
             drives = response.json()
-            drive_count = len(drives.get('value', []))
-            print(f'   ✅ Found {drive_count} accessible drives')
+            shown_drives = drives.get('value', [])
+            log.info(f'   ✅ Showing {len(shown_drives)} accessible drives')
             
-            for i, drive in enumerate(drives.get('value', [])[:10]):  # Show first 10
-                print(f'      {i+1}. {drive.get("name", "N/A")} (Type: {drive.get("driveType", "N/A")})')
-                print(f'         ID: {drive.get("id", "N/A")}')
-                print(f'         Owner: {drive.get("owner", {}).get("user", {}).get("displayName", "N/A")}')
+            # List every shown drive's root concurrently
+            listed_ids = [drive.get('id') for drive in shown_drives if drive.get('id')]
+            files_responses = dict(zip(listed_ids, await fetch_all(
+                [f'{GRAPH}/drives/{drive_id}/root/children?{CHILDREN_QUERY}' for drive_id in listed_ids],
+                headers, session
+            )))
+            
+            for i, drive in enumerate(shown_drives):
+                log.info(f'      {i+1}. {drive.get("name", "N/A")} (Type: {drive.get("driveType", "N/A")})')
+                log.info(f'         ID: {drive.get("id", "N/A")}')
+                log.info(f'         Owner: {drive.get("owner", {}).get("user", {}).get("displayName", "N/A")}')
                 
                 # Try to list files in this drive
                 drive_id = drive.get('id')
                 if drive_id:
-                    files_response = requests.get(
-                        f'https://graph.microsoft.com/v1.0/drives/{drive_id}/root/children',
-                        headers=headers
-                    )
+                    files_response = files_responses[drive_id]
                     if files_response.status_code == 200:
-                        files = files_response.json()
-                        file_count = len(files.get('value', []))
-                        print(f'         📁 Files/Folders: {file_count}')
+                        shown_files, file_count = await head_and_count(
+                            paged(files_response.url, headers, session, files_response.json()), 3
+                        )
+                        log.info(f'         📁 Files/Folders: {file_count}')
                         
                         # Show first few files
-                        for j, file_item in enumerate(files.get('value', [])[:3]):
+                        for j, file_item in enumerate(shown_files):
                             file_type = "📁" if file_item.get('folder') else "📄"
-                            print(f'            {file_type} {file_item.get("name", "N/A")}')
+                            log.info(f'            {file_type} {file_item.get("name", "N/A")}')
                     else:
-                        print(f'         ❌ Cannot access files: {files_response.status_code}')
-                print()
+                        log.info(f'         ❌ Cannot access files: {files_response.status_code}')
+                log.info('')
         else:
-            print(f'   ❌ Error: {response.text}')
+            log.info(f'   ❌ Error: {error_message(response)}')
         
         # Method 3: Get drives through SharePoint sites
-        print("\n🔍 Method 3: OneDrive through SharePoint sites...")
+        log.info("\n🔍 Method 3: OneDrive through SharePoint sites...")
+        
+        # Drives keyed by owning user ID, reused by Method 4 so only users not
+        # covered here need their own drive lookup
+        drives_by_owner = {}
         
-        # First get all sites
-        sites_response = requests.get('https://graph.microsoft.com/v1.0/sites?search=*', headers=headers)
+        # First get all sites (getAllSites includes users' personal OneDrive sites)
+        sites_response = await cached_fetch(f'{GRAPH}/sites/getAllSites?{SITES_QUERY}', headers, session)
         if sites_response.status_code == 200:
-            sites = sites_response.json()
-            print(f'   Checking {len(sites.get("value", []))} sites for OneDrive content...')
+            sites = [site async for site in paged(sites_response.url, headers, session, sites_response.json())]
+            log.info(f'   Checking {len(sites)} sites for OneDrive content...')
+            
+            # Get drives for every site concurrently
+            site_ids = [site.get('id') for site in sites if site.get('id')]
+            drives_responses = dict(zip(site_ids, await fetch_all(
+                [f'{GRAPH}/sites/{site_id}/drives?{DRIVES_QUERY}' for site_id in site_ids],
+                headers, session
+            )))
+            
+            for response in drives_responses.values():
+                if response.status_code == 200:
+                    for drive in response.json().get('value', []):
+                        # Only OneDrives count; user-owned document libraries
+                        # are left to Method 4's /users/{id}/drive lookup
+                        if drive.get('driveType') != 'business':
+                            continue
+                        owner_id = drive.get('owner', {}).get('user', {}).get('id')
+                        if owner_id:
+                            drives_by_owner.setdefault(owner_id, drive)
+            
+            # Then list the root of every OneDrive-type drive concurrently
+            onedrive_ids = [
+                drive.get('id')
+                for response in drives_responses.values() if response.status_code == 200
+                for drive in response.json().get('value', [])
+                if drive.get('id') and (
+                    'onedrive' in drive.get('driveType', '').lower()
+                    or 'personal' in drive.get('name', 'N/A').lower()
+                )
+            ]
+            files_responses = dict(zip(onedrive_ids, await fetch_all(
+                [f'{GRAPH}/drives/{drive_id}/root/children?{CHILDREN_QUERY}' for drive_id in onedrive_ids],
+                headers, session
+            )))
             
             onedrive_found = False
-            for site in sites.get('value', []):
+            for site in sites:
                 site_id = site.get('id')
                 site_name = site.get('displayName', 'N/A')
                 
                 if site_id:
-                    # Get drives for this site
-                    drives_response = requests.get(
-                        f'https://graph.microsoft.com/v1.0/sites/{site_id}/drives',
-                        headers=headers
-                    )
+                    drives_response = drives_responses[site_id]
                     
                     if drives_response.status_code == 200:
                         site_drives = drives_response.json()
@@ -124,114 +173,125 @@ async def test_onedrive_files():
                             # Look for OneDrive-type drives
                             if 'onedrive' in drive_type.lower() or 'personal' in drive_name.lower():
                                 onedrive_found = True
-                                print(f'   ✅ Found OneDrive in site "{site_name}":')
-                                print(f'      Drive: {drive_name} (Type: {drive_type})')
-                                print(f'      ID: {drive.get("id", "N/A")}')
+                                log.info(f'   ✅ Found OneDrive in site "{site_name}":')
+                                log.info(f'      Drive: {drive_name} (Type: {drive_type})')
+                                log.info(f'      ID: {drive.get("id", "N/A")}')
                                 
                                 # Try to list files
                                 drive_id = drive.get('id')
                                 if drive_id:
-                                    files_response = requests.get(
-                                        f'https://graph.microsoft.com/v1.0/drives/{drive_id}/root/children',
-                                        headers=headers
-                                    )
+                                    files_response = files_responses[drive_id]
                                     if files_response.status_code == 200:
-                                        files = files_response.json()
-                                        file_count = len(files.get('value', []))
-                                        print(f'      📁 Total items: {file_count}')
+                                        shown_files, file_count = await head_and_count(
+                                            paged(files_response.url, headers, session, files_response.json()),
+                                            10  # Show first 10
+                                        )
+                                        log.info(f'      📁 Total items: {file_count}')
                                         
-                                        print(f'      📋 Files and folders:')
-                                        for file_item in files.get('value', [])[:10]:  # Show first 10
+                                        log.info(f'      📋 Files and folders:')
+                                        for file_item in shown_files:
                                             file_type = "📁" if file_item.get('folder') else "📄"
                                             size = file_item.get('size', 0)
                                             modified = file_item.get('lastModifiedDateTime', 'N/A')
-                                            print(f'         {file_type} {file_item.get("name", "N/A")} ({size} bytes, {modified[:10]})')
+                                            log.info(f'         {file_type} {file_item.get("name", "N/A")} ({size} bytes, {modified[:10]})')
                                     else:
-                                        print(f'      ❌ Cannot access files: {files_response.status_code}')
-                                print()
+                                        log.info(f'      ❌ Cannot access files: {files_response.status_code}')
+                                log.info('')
             
             if not onedrive_found:
-                print('   ℹ️  No OneDrive-specific drives found in SharePoint sites')
+                log.info('   ℹ️  No OneDrive-specific drives found in SharePoint sites')
         
         # Method 4: Try to find user-specific drives
-        print("\n🔍 Method 4: Search for user drives...")
+        log.info("\n🔍 Method 4: Search for user drives...")
         
         # Try to get users and their drives
-        users_response = requests.get('https://graph.microsoft.com/v1.0/users', headers=headers)
+        users_response = await cached_fetch(f'{GRAPH}/users?{USERS_QUERY}&$top=5', headers, session)  # Check first 5 users
         if users_response.status_code == 200:
             users = users_response.json()
-            user_count = len(users.get('value', []))
-            print(f'   Found {user_count} users in directory')
+            checked_users = users.get('value', [])
+            log.info(f'   Checking {len(checked_users)} users in directory')
+            
+            # Match users to the drives found in Method 3. Users it didn't cover
+            # (getAllSites failed, or their personal site wasn't listed) have
+            # their drive looked up directly, in one batched round trip
+            user_drives = [drives_by_owner.get(user.get('id')) for user in checked_users]
+            drive_results = await graph_batch(headers, [
+                (f'd{i}', f'/users/{user.get("id")}/drive?{DRIVES_QUERY}')
+                for i, (user, user_drive) in enumerate(zip(checked_users, user_drives)) if not user_drive
+            ], session=session)
+            for i, user_drive in enumerate(user_drives):
+                drive_response = drive_results.get(f'd{i}', {})
+                if not user_drive and drive_response.get('status') == 200:
+                    user_drives[i] = drive_response.get('body', {})
+            
+            # Then fetch the found drives' root listings in one batched round trip
+            batch_results = await graph_batch(headers, [
+                (f'f{i}', f'/drives/{user_drive["id"]}/root/children?{CHILDREN_QUERY}')
+                for i, user_drive in enumerate(user_drives) if user_drive
+            ], session=session)
             
-            for user in users.get('value', [])[:5]:  # Check first 5 users
-                user_id = user.get('id')
+            for i, (user, user_drive) in enumerate(zip(checked_users, user_drives)):
                 user_name = user.get('displayName', 'N/A')
                 user_email = user.get('mail') or user.get('userPrincipalName', 'N/A')
                 
-                print(f'   👤 Checking user: {user_name} ({user_email})')
+                log.info(f'   👤 Checking user: {user_name} ({user_email})')
                 
-                # Try to get their drive
-                user_drive_response = requests.get(
-                    f'https://graph.microsoft.com/v1.0/users/{user_id}/drive',
-                    headers=headers
-                )
-                
-                if user_drive_response.status_code == 200:
-                    user_drive = user_drive_response.json()
-                    print(f'      ✅ OneDrive found: {user_drive.get("name", "N/A")}')
-                    print(f'      Drive Type: {user_drive.get("driveType", "N/A")}')
+                if user_drive:
+                    log.info(f'      ✅ OneDrive found: {user_drive.get("name", "N/A")}')
+                    log.info(f'      Drive Type: {user_drive.get("driveType", "N/A")}')
                     
-                    # Try to list files
-                    files_response = requests.get(
-                        f'https://graph.microsoft.com/v1.0/users/{user_id}/drive/root/children',
-                        headers=headers
-                    )
-                    if files_response.status_code == 200:
-                        files = files_response.json()
-                        file_count = len(files.get('value', []))
-                        print(f'      📁 Files: {file_count}')
+                    files_response = batch_results.get(f'f{i}', {})
+                    if files_response.get('status') == 200:
+                        shown_files, file_count = await head_and_count(
+                            paged(None, headers, session, files_response.get('body', {})),
+                            3  # Show first 3
+                        )
+                        log.info(f'      📁 Files: {file_count}')
                         
-                        for file_item in files.get('value', [])[:3]:  # Show first 3
+                        for file_item in shown_files:
                             file_type = "📁" if file_item.get('folder') else "📄"
-                            print(f'         {file_type} {file_item.get("name", "N/A")}')
+                            log.info(f'         {file_type} {file_item.get("name", "N/A")}')
                     else:
-                        print(f'      ❌ Cannot access files: {files_response.status_code}')
+                        log.info(f'      ❌ Cannot access files: {files_response.get("status")}')
                 else:
-                    print(f'      ❌ Cannot access drive: {user_drive_response.status_code}')
-                print()
+                    log.info(f'      ❌ Cannot access drive: {drive_results.get(f"d{i}", {}).get("status")}')
+                log.info('')
         else:
-            print(f'   ❌ Cannot list users: {users_response.status_code}')
+            log.info(f'   ❌ Cannot list users: {users_response.status_code}')
         
-        print("\n" + "=" * 50)
-        print("✅ OneDrive discovery test completed!")
-        print("📄 Check the results above to see what OneDrive content is accessible")
+        log.info("\n" + "=" * 50)
+        log.info("✅ OneDrive discovery test completed!")
+        log.info("📄 Check the results above to see what OneDrive content is accessible")
         return True
         
     except Exception as e:
-        print(f'\n❌ Test failed with error: {e}')
+        log.info(f'\n❌ Test failed with error: {e}')
         import traceback
-        traceback.print_exc()
+        log.info(traceback.format_exc())
         return False
 
 def main():
     """Main test function."""
+    listener = start_log_listener()
     try:
         # Run the async test
         result = asyncio.run(test_onedrive_files())
         
         if result:
-            print("\n🎉 OneDrive discovery test completed!")
+            log.info("\n🎉 OneDrive discovery test completed!")
             return 0
         else:
-            print("\n💥 Test failed. Check the output above for details.")
+            log.info("\n💥 Test failed. Check the output above for details.")
             return 1
             
     except KeyboardInterrupt:
-        print("\n⚠️ Test interrupted by user")
+        log.info("\n⚠️ Test interrupted by user")
         return 1
     except Exception as e:
-        print(f"\n💥 Unexpected error: {e}")
+        log.info(f"\n💥 Unexpected error: {e}")
         return 1
+    finally:
+        listener.stop()
 
 if __name__ == "__main__":
     exit_code = main()
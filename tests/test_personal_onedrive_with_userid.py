@@ -8,6 +8,7 @@ similar to the PowerShell approach that worked for you.
 
 import sys
 import asyncio
+import functools
 from pathlib import Path
 
 # Add src to Python path
@@ -15,74 +16,101 @@ sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
 from onedrive_backup.auth.microsoft_auth import MicrosoftGraphAuth
 from onedrive_backup.config.settings import CredentialsConfig
-import requests
-import json
+from graph_helpers import USERS_QUERY, error_message, graph_batch, graph_cache, loads, paged, session
+from collections import Counter, defaultdict
+
+# Seconds a cached user or folder listing is reused without asking Graph
+LISTING_CACHE_TTL = 3600
+
+# Folder listings: largest page size, projected to the fields that are printed
+FOLDER_QUERY = '$top=999&$select=id,name,size,folder,file,createdDateTime,lastModifiedDateTime,webUrl'
+
+# User drive lookups: only the fields shown in the drive summary
+DRIVE_QUERY = '$select=id,name,driveType,quota'
+
+SIZE_NAMES = ("B", "KB", "MB", "GB", "TB")
 
 def format_file_size(size_bytes):
     """Format file size in human readable format."""
+    # Graph sizes may arrive as floats; normalise so equal sizes share a cache entry
+    return _format_file_size(int(size_bytes))
+
+@functools.lru_cache(maxsize=4096)
+def _format_file_size(size_bytes):
     if size_bytes == 0:
         return "0 B"
-    size_names = ["B", "KB", "MB", "GB", "TB"]
-    i = 0
-    while size_bytes >= 1024 and i < len(size_names) - 1:
-        size_bytes /= 1024.0
-        i += 1
-    return f"{size_bytes:.1f} {size_names[i]}"
+    if size_bytes < 1024:
+        return f"{size_bytes:.1f} B"
+    # Each unit is 2**10 larger than the previous one
+    i = min((size_bytes.bit_length() - 1) // 10, len(SIZE_NAMES) - 1)
+    return f"{size_bytes / (1 << (i * 10)):.1f} {SIZE_NAMES[i]}"
+
+def format_timestamp(value):
+    """Format a Graph ISO-8601 timestamp as 'YYYY-MM-DD HH:MM:SS'."""
+    if not value:
+        return 'N/A'
+    # One slice and a single-character replace; str.translate is several times slower here
+    return value[:19].replace('T', ' ')
+
+# File extension -> emoji shown next to the file name
+FILE_ICONS = {
+    'doc': '📝', 'docx': '📝', 'txt': '📝', 'rtf': '📝',
+    'pdf': '📑',
+    'xls': '📊', 'xlsx': '📊', 'csv': '📊',
+    'ppt': '📽️', 'pptx': '📽️',
+    'jpg': '🖼️', 'jpeg': '🖼️', 'png': '🖼️', 'gif': '🖼️', 'bmp': '🖼️',
+    'mp4': '🎥', 'avi': '🎥', 'mkv': '🎥', 'mov': '🎥',
+    'mp3': '🎵', 'wav': '🎵', 'flac': '🎵',
+    'zip': '📦', 'rar': '📦', '7z': '📦',
+    'py': '💻', 'js': '💻', 'html': '💻', 'css': '💻',
+}
 
-def get_file_icon(name):
-    """Get appropriate emoji for file type."""
+def file_extension(name):
+    """Get the lowercased extension of a file name, or 'no_ext' if it has none."""
     if not name or '.' not in name:
-        return "📄"
-    
-    ext = name.split('.')[-1].lower()
+        return 'no_ext'
+    return name.rpartition('.')[2].lower()
+
+def get_file_icon(ext):
+    """Get appropriate emoji for a file extension from file_extension()."""
+    return FILE_ICONS.get(ext, '📄')
+
+async def list_folder_contents(headers, user_id, folder_id="root", level=0, max_level=2, session=session):
+    """List contents of a folder in user's OneDrive.
     
-    icons = {
-        'doc': '📝', 'docx': '📝', 'txt': '📝', 'rtf': '📝',
-        'pdf': '📑',
-        'xls': '📊', 'xlsx': '📊', 'csv': '📊',
-        'ppt': '📽️', 'pptx': '📽️',
-        'jpg': '🖼️', 'jpeg': '🖼️', 'png': '🖼️', 'gif': '🖼️', 'bmp': '🖼️',
-        'mp4': '🎥', 'avi': '🎥', 'mkv': '🎥', 'mov': '🎥',
-        'mp3': '🎵', 'wav': '🎵', 'flac': '🎵',
-        'zip': '📦', 'rar': '📦', '7z': '📦',
-        'py': '💻', 'js': '💻', 'html': '💻', 'css': '💻',
-    }
+    Sub-folders are listed concurrently; their output is spliced back in
+    under each folder so the printed tree keeps its order.
     
-    return icons.get(ext, '📄')
-
-def list_folder_contents(headers, user_id, folder_id="root", level=0, max_level=2):
-    """List contents of a folder in user's OneDrive."""
+    Returns:
+        Tuple of (items found, output blocks to write)
+    """
     if level > max_level:
-        return []
+        return [], []
     
     indent = "  " * level
     all_items = []
+    buf = []  # one newline-terminated block per item
+    subfolders = []  # (position in buf, folder ID)
     
     if folder_id == "root":
-        endpoint = f'https://graph.microsoft.com/v1.0/users/{user_id}/drive/root/children'
+        endpoint = f'https://graph.microsoft.com/v1.0/users/{user_id}/drive/root/children?{FOLDER_QUERY}'
     else:
-        endpoint = f'https://graph.microsoft.com/v1.0/users/{user_id}/drive/items/{folder_id}/children'
+        endpoint = f'https://graph.microsoft.com/v1.0/users/{user_id}/drive/items/{folder_id}/children?{FOLDER_QUERY}'
     
     try:
-        response = requests.get(endpoint, headers=headers)
+        response = await graph_cache.get_or_fetch(endpoint, headers, LISTING_CACHE_TTL, session)
+        code = response.status_code
         
-        if response.status_code == 200:
-            items = response.json()
-            
-            for item in items.get('value', []):
+        if code == 200:
+            # Follow @odata.nextLink so folders beyond one page are listed in full
+            async for item in paged(response.url, headers, session, response.content):
                 name = item.get('name', 'N/A')
                 size = item.get('size', 0)
-                modified = item.get('lastModifiedDateTime', 'N/A')
-                created = item.get('createdDateTime', 'N/A')
+                modified = format_timestamp(item.get('lastModifiedDateTime'))
+                created = format_timestamp(item.get('createdDateTime'))
                 item_id = item.get('id', 'N/A')
                 web_url = item.get('webUrl', 'N/A')
                 
-                # Format dates
-                if modified != 'N/A':
-                    modified = modified[:19].replace('T', ' ')
-                if created != 'N/A':
-                    created = created[:19].replace('T', ' ')
-                
                 item_info = {
                     'name': name,
                     'id': item_id,
@@ -99,55 +127,173 @@ def list_folder_contents(headers, user_id, folder_id="root", level=0, max_level=
                     child_count = item.get('folder', {}).get('childCount', 0)
                     item_info['child_count'] = child_count
                     
-                    print(f"{indent}📁 {name}/ ({child_count} items)")
-                    print(f"{indent}   Created: {created}")
-                    print(f"{indent}   Modified: {modified}")
-                    print(f"{indent}   Web URL: {web_url}")
+                    buf.append(
+                        f"{indent}📁 {name}/ ({child_count} items)\n"
+                        f"{indent}   Created: {created}\n"
+                        f"{indent}   Modified: {modified}\n"
+                        f"{indent}   Web URL: {web_url}\n"
+                    )
                     
                     all_items.append(item_info)
                     
                     # Recursively list folder contents if not too deep
                     if level < max_level and child_count > 0:
-                        print(f"{indent}   Contents:")
-                        sub_items = list_folder_contents(headers, user_id, item_id, level + 1, max_level)
-                        all_items.extend(sub_items)
+                        buf.append(f"{indent}   Contents:\n")
+                        subfolders.append((len(buf), item_id))
                     
-                    print()
+                    buf.append("\n")
                 else:
                     # It's a file
-                    file_icon = get_file_icon(name)
+                    # Derive the extension once; the icon and the statistics both use it
+                    ext = file_extension(name)
+                    file_icon = get_file_icon(ext)
+                    item_info['ext'] = ext
                     item_info['icon'] = file_icon
                     item_info['mime_type'] = item.get('file', {}).get('mimeType', 'N/A')
-                    item_info['download_url'] = item.get('@microsoft.graph.downloadUrl', 'N/A')
                     
-                    print(f"{indent}{file_icon} {name}")
-                    print(f"{indent}   Size: {format_file_size(size)}")
-                    print(f"{indent}   Created: {created}")
-                    print(f"{indent}   Modified: {modified}")
-                    print(f"{indent}   Web URL: {web_url}")
-                    
-                    if item_info['download_url'] != 'N/A':
-                        print(f"{indent}   Download: Available")
+                    buf.append(
+                        f"{indent}{file_icon} {name}\n"
+                        f"{indent}   Size: {format_file_size(size)}\n"
+                        f"{indent}   Created: {created}\n"
+                        f"{indent}   Modified: {modified}\n"
+                        f"{indent}   Web URL: {web_url}\n\n"
+                    )
                     
                     all_items.append(item_info)
-                    print()
+            
+            # List all sub-folders concurrently, then splice their output in
+            # back to front so earlier positions stay valid
+            # Coroutines are only created here, so a failing page above leaves
+            # none of them un-awaited
+            results = await asyncio.gather(*(
+                list_folder_contents(headers, user_id, sub_id, level + 1, max_level, session)
+                for _, sub_id in subfolders
+            ))
+            for (position, _), (sub_items, sub_buf) in reversed(list(zip(subfolders, results))):
+                buf[position:position] = sub_buf
+            for sub_items, _ in results:
+                all_items.extend(sub_items)
         else:
-            print(f"{indent}❌ Cannot access folder: {response.status_code}")
-            if response.status_code == 404:
-                print(f"{indent}   Folder may be empty or not exist")
-            else:
-                try:
-                    error_info = response.json()
-                    print(f"{indent}   Error: {error_info.get('error', {}).get('message', 'Unknown')}")
-                except:
-                    pass
+            buf.append(f"{indent}❌ Cannot access folder: {code}\n")
+            if code == 404:
+                buf.append(f"{indent}   Folder may be empty or not exist\n")
+            elif code == 403:
+                buf.append(f"{indent}   Access denied; may need Files.Read.All permission\n")
+            elif response.content:
+                buf.append(f"{indent}   Error: {error_message(response)}\n")
     
     except Exception as e:
-        print(f"{indent}❌ Error accessing folder: {e}")
+        buf.append(f"{indent}❌ Error accessing folder: {e}\n")
+    
+    return all_items, buf
+
+async def scan_user_drive(headers, user, drive_response, session=session):
+    """Scan one user's OneDrive without printing anything.
+    
+    Args:
+        headers: Graph request headers
+        user: Dict with the user's id, name and email
+        drive_response: The user's /drive response from the batch lookup
+        session: requests.Session to send the listing requests on
     
-    return all_items
+    Returns:
+        Dict with the user, the drive response and, for an accessible drive,
+        the listed items and their output blocks
+    """
+    report = {'user': user, 'drive_response': drive_response, 'items': [], 'buf': []}
+    if drive_response.get('status') == 200:
+        report['items'], report['buf'] = await list_folder_contents(
+            headers, user['id'], "root", 0, 2, session
+        )
+    return report
 
-async def test_personal_onedrive_with_userid():
+def print_user_report(i, report):
+    """Print the drive summary, listing and statistics of one scanned user."""
+    user = report['user']
+    user_id = user['id']
+    user_name = user['name']
+    user_email = user['email']
+    
+    print(f"\n{'='*60}")
+    print(f"👤 USER {i+1}: {user_name}")
+    print(f"{'='*60}")
+    print(f"📧 Email: {user_email}")
+    print(f"🆔 User ID: {user_id}")
+    
+    # Try to access their OneDrive
+    print(f"\n🔍 Accessing OneDrive...")
+    drive_response = report['drive_response']
+    drive_status = drive_response.get('status')
+    
+    if drive_status == 200:
+        drive_info = drive_response.get('body', {})
+        drive_name = drive_info.get('name', 'N/A')
+        drive_type = drive_info.get('driveType', 'N/A')
+        drive_id = drive_info.get('id', 'N/A')
+        
+        print(f"✅ OneDrive found: {drive_name}")
+        print(f"🏷️  Type: {drive_type}")
+        print(f"🆔 Drive ID: {drive_id}")
+        
+        # Get quota information
+        quota = drive_info.get('quota', {})
+        if quota:
+            total = quota.get('total', 0)
+            used = quota.get('used', 0)
+            remaining = quota.get('remaining', 0)
+            
+            if total > 0:
+                print(f"💾 Storage: {format_file_size(used)} used of {format_file_size(total)}")
+                print(f"📊 Usage: {(used / total) * 100:.1f}%")
+                print(f"💿 Available: {format_file_size(remaining)}")
+        
+        # List files in OneDrive root (similar to PowerShell command)
+        print(f"\n📋 OneDrive Contents:")
+        print("-" * 50)
+        
+        all_items = report['items']
+        sys.stdout.write(''.join(report['buf']))
+        sys.stdout.flush()
+        
+        # Statistics: split files from folders and tally per-extension counts
+        # and sizes in a single pass; the total size falls out of it
+        files = []
+        folders = []
+        count_by_ext = Counter()
+        size_by_ext = defaultdict(int)
+        for item in all_items:
+            if item['is_folder']:
+                folders.append(item)
+                continue
+            files.append(item)
+            ext = item['ext']
+            count_by_ext[ext] += 1
+            size_by_ext[ext] += item['size']
+        total_size = sum(size_by_ext.values())
+        
+        print(f"\n📊 OneDrive Statistics:")
+        print(f"   📄 Files: {len(files)}")
+        print(f"   📁 Folders: {len(folders)}")
+        print(f"   📏 Total size: {format_file_size(total_size)}")
+        
+        # File type breakdown
+        if files:
+            print(f"\n📈 File Type Breakdown:")
+            for ext, count in count_by_ext.most_common():
+                print(f"   .{ext}: {count} files ({format_file_size(size_by_ext[ext])})")
+    
+    elif drive_status == 403:
+        print(f"❌ Access denied to OneDrive")
+        print("   May need Files.Read.All permission or user may not have OneDrive")
+    elif drive_status == 404:
+        print(f"❌ OneDrive not found for this user")
+        print("   User may not have OneDrive provisioned")
+    else:
+        print(f"❌ Cannot access OneDrive: {drive_status}")
+        error_details = drive_response.get('body', {})
+        print(f"   Error: {error_details.get('error', {}).get('message', 'Unknown')}")
+
+async def test_personal_onedrive_with_userid(session=session):
     """Test accessing personal OneDrive using specific user ID/email."""
     print("🚀 Personal OneDrive Access with User ID")
     print("=" * 60)
@@ -177,12 +323,14 @@ async def test_personal_onedrive_with_userid():
         # Method 1: Try to get users first to find available user IDs
         print("\n🔍 Step 1: Looking for available users...")
         
-        users_response = requests.get('https://graph.microsoft.com/v1.0/users?$top=10', headers=headers)
+        users_response = await graph_cache.get_or_fetch(
+            f'https://graph.microsoft.com/v1.0/users?$top=10&{USERS_QUERY}', headers, LISTING_CACHE_TTL, session
+        )
         
         available_users = []
         
         if users_response.status_code == 200:
-            users_data = users_response.json()
+            users_data = loads(users_response.content)
             users = users_data.get('value', [])
             print(f'✅ Found {len(users)} users in organization')
             
@@ -221,11 +369,16 @@ async def test_personal_onedrive_with_userid():
                 "admin@yourdomain.com"
             ]
             
-            for email in example_emails:
+            # Probe every candidate in one batched round trip
+            probe_results = await graph_batch(headers, [
+                (f'e{i}', f'/users/{email}?{USERS_QUERY}') for i, email in enumerate(example_emails)
+            ], session=session)
+            
+            for i, email in enumerate(example_emails):
                 print(f"\n   Trying user: {email}")
-                user_response = requests.get(f'https://graph.microsoft.com/v1.0/users/{email}', headers=headers)
-                if user_response.status_code == 200:
-                    user_info = user_response.json()
+                user_response = probe_results.get(f'e{i}', {})
+                if user_response.get('status') == 200:
+                    user_info = user_response.get('body', {})
                     available_users.append({
                         'id': user_info.get('id'),
                         'name': user_info.get('displayName', 'N/A'),
@@ -233,92 +386,27 @@ async def test_personal_onedrive_with_userid():
                     })
                     print(f"   ✅ Found user: {user_info.get('displayName', 'N/A')}")
                 else:
-                    print(f"   ❌ User not found: {user_response.status_code}")
+                    print(f"   ❌ User not found: {user_response.get('status')}")
         
         # Method 2: Access OneDrive for each found user
         if available_users:
             print(f"\n🔍 Step 2: Accessing OneDrive for found users...")
             
-            for i, user in enumerate(available_users[:3]):  # Test first 3 users
-                user_id = user['id']
-                user_name = user['name']
-                user_email = user['email']
-                
-                print(f"\n{'='*60}")
-                print(f"👤 USER {i+1}: {user_name}")
-                print(f"{'='*60}")
-                print(f"📧 Email: {user_email}")
-                print(f"🆔 User ID: {user_id}")
-                
-                # Try to access their OneDrive
-                print(f"\n🔍 Accessing OneDrive...")
-                drive_response = requests.get(f'https://graph.microsoft.com/v1.0/users/{user_id}/drive', headers=headers)
-                
-                if drive_response.status_code == 200:
-                    drive_info = drive_response.json()
-                    drive_name = drive_info.get('name', 'N/A')
-                    drive_type = drive_info.get('driveType', 'N/A')
-                    drive_id = drive_info.get('id', 'N/A')
-                    
-                    print(f"✅ OneDrive found: {drive_name}")
-                    print(f"🏷️  Type: {drive_type}")
-                    print(f"🆔 Drive ID: {drive_id}")
-                    
-                    # Get quota information
-                    quota = drive_info.get('quota', {})
-                    if quota:
-                        total = quota.get('total', 0)
-                        used = quota.get('used', 0)
-                        remaining = quota.get('remaining', 0)
-                        
-                        if total > 0:
-                            print(f"💾 Storage: {format_file_size(used)} used of {format_file_size(total)}")
-                            print(f"📊 Usage: {(used / total) * 100:.1f}%")
-                            print(f"💿 Available: {format_file_size(remaining)}")
-                    
-                    # List files in OneDrive root (similar to PowerShell command)
-                    print(f"\n📋 OneDrive Contents:")
-                    print("-" * 50)
-                    
-                    all_items = list_folder_contents(headers, user_id, "root", 0, 2)
-                    
-                    # Statistics
-                    files = [item for item in all_items if not item['is_folder']]
-                    folders = [item for item in all_items if item['is_folder']]
-                    total_size = sum(item['size'] for item in files)
-                    
-                    print(f"\n📊 OneDrive Statistics:")
-                    print(f"   📄 Files: {len(files)}")
-                    print(f"   📁 Folders: {len(folders)}")
-                    print(f"   📏 Total size: {format_file_size(total_size)}")
-                    
-                    # File type breakdown
-                    if files:
-                        type_stats = {}
-                        for file_item in files:
-                            ext = file_item['name'].split('.')[-1].lower() if '.' in file_item['name'] else 'no_ext'
-                            if ext not in type_stats:
-                                type_stats[ext] = {'count': 0, 'size': 0}
-                            type_stats[ext]['count'] += 1
-                            type_stats[ext]['size'] += file_item['size']
-                        
-                        print(f"\n📈 File Type Breakdown:")
-                        for ext, stats in sorted(type_stats.items(), key=lambda x: x[1]['count'], reverse=True):
-                            print(f"   .{ext}: {stats['count']} files ({format_file_size(stats['size'])})")
-                
-                elif drive_response.status_code == 403:
-                    print(f"❌ Access denied to OneDrive")
-                    print("   May need Files.Read.All permission or user may not have OneDrive")
-                elif drive_response.status_code == 404:
-                    print(f"❌ OneDrive not found for this user")
-                    print("   User may not have OneDrive provisioned")
-                else:
-                    print(f"❌ Cannot access OneDrive: {drive_response.status_code}")
-                    try:
-                        error_details = drive_response.json()
-                        print(f"   Error: {error_details.get('error', {}).get('message', 'Unknown')}")
-                    except:
-                        pass
+            checked_users = available_users[:3]  # Test first 3 users
+            
+            # Fetch every checked user's drive in one batched round trip; drives
+            # seen on an earlier run are revalidated by ETag instead of re-sent
+            drive_results = await graph_cache.batch(headers, [
+                (f'd{i}', f'/users/{user["id"]}/drive?{DRIVE_QUERY}') for i, user in enumerate(checked_users)
+            ], LISTING_CACHE_TTL, session)
+            
+            # Scan every checked user's drive concurrently, then report them in order
+            reports = await asyncio.gather(*(
+                scan_user_drive(headers, user, drive_results.get(f'd{i}', {}), session)
+                for i, user in enumerate(checked_users)
+            ))
+            for i, report in enumerate(reports):
+                print_user_report(i, report)
         else:
             print("\n❌ No users found to test OneDrive access")
             print("\n💡 Instructions for manual testing:")
@@ -337,6 +425,8 @@ async def test_personal_onedrive_with_userid():
 
 def main():
     """Main function."""
+    # Block-buffer stdout; listings are written and flushed once per drive
+    sys.stdout.reconfigure(line_buffering=False)
     try:
         result = asyncio.run(test_personal_onedrive_with_userid())
         
@@ -15,10 +15,10 @@ sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
 from onedrive_backup.auth.microsoft_auth import MicrosoftGraphAuth
 from onedrive_backup.config.settings import CredentialsConfig
-import requests
+from graph_helpers import fetch, session
 import json
 
-async def test_sharepoint_connection():
+async def test_sharepoint_connection(session=session):
     """Test SharePoint connection with real credentials."""
     print("🚀 SharePoint Connection Test")
     print("=" * 50)
@@ -53,9 +53,21 @@ async def test_sharepoint_connection():
             'Content-Type': 'application/json'
         }
         
+        site_url = 'bernoullisofrware.sharepoint.com'
+        site_endpoint = f'https://graph.microsoft.com/v1.0/sites/{site_url}'
+        onedrive_endpoint = 'https://graph.microsoft.com/v1.0/me/drive'
+        
+        # Tests 1, 2 and 4 are independent, so issue them together; only the
+        # library listing in test 3 has to wait for the site ID
+        sites_response, site_response, drive_response = await asyncio.gather(
+            fetch('https://graph.microsoft.com/v1.0/sites?search=*', headers, session),
+            fetch(site_endpoint, headers, session),
+            fetch(onedrive_endpoint, headers, session),
+        )
+        
         # Test 1: Get all accessible sites
         print("\n🔍 Test 1: Getting all accessible sites...")
-        response = requests.get('https://graph.microsoft.com/v1.0/sites?search=*', headers=headers)
+        response = sites_response
         print(f'   API Response Status: {response.status_code}')
         
         if response.status_code == 200:
@@ -75,12 +87,10 @@ async def test_sharepoint_connection():
             
         # Test 2: Test specific SharePoint site
         print("\n🔍 Test 2: Testing specific SharePoint site...")
-        site_url = 'bernoullisofrware.sharepoint.com'
         print(f'   Target site: https://{site_url}')
         
         # Method 1: Try to get site by hostname
-        site_endpoint = f'https://graph.microsoft.com/v1.0/sites/{site_url}'
-        response = requests.get(site_endpoint, headers=headers)
+        response = site_response
         print(f'   Method 1 - Direct site access: {response.status_code}')
         
         if response.status_code == 200:
@@ -94,7 +104,7 @@ async def test_sharepoint_connection():
             if site_id:
                 print("\n🔍 Test 3: Getting document libraries...")
                 libraries_endpoint = f'https://graph.microsoft.com/v1.0/sites/{site_id}/drives'
-                response = requests.get(libraries_endpoint, headers=headers)
+                response = await fetch(libraries_endpoint, headers, session)
                 print(f'   Libraries API Response: {response.status_code}')
                 
                 if response.status_code == 200:
@@ -116,7 +126,7 @@ async def test_sharepoint_connection():
             # Try alternative method - search for the site
             print("\n🔍 Alternative: Searching for site by name...")
             search_endpoint = f'https://graph.microsoft.com/v1.0/sites?search=bernoulli'
-            response = requests.get(search_endpoint, headers=headers)
+            response = await fetch(search_endpoint, headers, session)
             print(f'   Search API Response: {response.status_code}')
             
             if response.status_code == 200:
@@ -128,8 +138,7 @@ async def test_sharepoint_connection():
         
         # Test 4: Test OneDrive access
         print("\n🔍 Test 4: Testing OneDrive access...")
-        onedrive_endpoint = 'https://graph.microsoft.com/v1.0/me/drive'
-        response = requests.get(onedrive_endpoint, headers=headers)
+        response = drive_response
         print(f'   OneDrive API Response: {response.status_code}')
         
         if response.status_code == 200: